@@ -1,4 +1,5 @@
 import pytest # type: ignore
+from collections import deque, Counter
 from fastapi.testclient import TestClient # type: ignore
 from app.main import app
 from app.services.nlp_pipeline import MedicalNLPPipeline
@@ -18,4 +19,22 @@ def sample_medical_text():
         "prescribe": "Prescribe Metformin 500mg twice daily for John Doe",
         "schedule": "Schedule follow-up next Tuesday at 2 PM",
         "query": "Check latest blood pressure readings for Jane Smith"
-    }
\ No newline at end of file
+    }
+
+class _SessionState(dict):
+    """Attribute-access dict standing in for st.session_state outside `streamlit run`"""
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+@pytest.fixture
+def ui_session_state(monkeypatch):
+    state = _SessionState(
+        stats={"texts": 0, "intents": Counter(), "entity_types": Counter(), "conditions": 0},
+        recent=deque(maxlen=5),
+        patient_rows=[],
+        patient_options={'condition': [], 'gender': []},
+        medication_rows=[],
+        appointment_rows=[]
+    )
+    monkeypatch.setattr("streamlit.session_state", state)
+    return state
\ No newline at end of file
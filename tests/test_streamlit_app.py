@@ -0,0 +1,97 @@
+import pytest # type: ignore
+import orjson
+import pandas as pd
+from ui import streamlit_app as ui_app
+
+def _patient_result(age_text=None):
+    temporal_info = [{"type": "age", "text": age_text}] if age_text else []
+    result = {
+        "intent": {"primary_intent": "add_patient", "confidence": 0.9},
+        "entities": {
+            "patient_info": [{"type": "patient", "text": "John Doe"}],
+            "medical_info": [{"type": "condition", "text": "diabetes"}],
+            "temporal_info": temporal_info
+        },
+        "_ingest_ts": "2024-01-01 10:00:00"
+    }
+    result["_first"] = ui_app.index_first_entities(result)
+    return result
+
+def test_quantile_box_uses_group_quartiles():
+    df = pd.DataFrame({
+        "type": ["condition"] * 5 + ["medication"] * 2,
+        "confidence": [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.8]
+    })
+    fig = ui_app._quantile_box(df, "type", "confidence", "Confidence")
+    
+    box = fig.data[0]
+    assert list(box.x) == ["condition", "medication"]
+    assert box.lowerfence[0] == pytest.approx(0.1)
+    assert box.median[0] == pytest.approx(0.3)
+    assert box.upperfence[0] == pytest.approx(0.5)
+    assert box.median[1] == pytest.approx(0.7)
+
+def test_quantile_box_empty_selection():
+    df = pd.DataFrame({"type": pd.Series([], dtype=object), "confidence": pd.Series([], dtype=float)})
+    fig = ui_app._quantile_box(df, "type", "confidence", "Confidence")
+    
+    assert len(fig.data) == 0
+    assert fig.layout.title.text == "Confidence"
+
+def test_top_counts_folds_remainder_into_other():
+    values = [f"type_{i}" for i in range(20) for _ in range(20 - i)]
+    counts = ui_app._top_counts(pd.Series(values), limit=5)
+    
+    assert len(counts) == 6
+    assert list(counts.index[:5]) == [f"type_{i}" for i in range(5)]
+    assert counts["Other"] == sum(20 - i for i in range(5, 20))
+    assert counts.sum() == len(values)
+
+def test_top_counts_without_fold():
+    counts = ui_app._top_counts(pd.Series(["a", "b", "a"]))
+    
+    assert counts.to_dict() == {"a": 2, "b": 1}
+
+def test_format_response_json():
+    response = {
+        "intent": {"primary_intent": "assign_medication", "confidence": 0.9},
+        "entities": {
+            "patient_info": [{"type": "patient", "text": "John Doe"}],
+            "medical_info": [
+                {"type": "medication", "text": "Aspirin"},
+                {"type": "medication", "text": "Metformin"},
+                {"type": "symptom", "text": "headache"}
+            ]
+        },
+        "follow_up_question": "What is the dosage for Metformin?"
+    }
+    formatted = orjson.loads(ui_app.format_response_json(response))
+    
+    assert formatted["intent"] == "assign_medication"
+    # Later occurrences of a type win, and unlisted types are left out
+    assert formatted["entities"] == {"patient": "John Doe", "medication": "Metformin"}
+    assert formatted["follow_up_question"] == "What is the dosage for Metformin?"
+    assert "medication_validation" not in formatted
+
+def test_format_response_json_non_dict():
+    assert ui_app.format_response_json("raw") == "raw"
+
+def test_age_num_parsed_at_ingest(ui_session_state):
+    ui_app.update_session_data(_patient_result("45 years old"))
+    
+    patient = ui_session_state.patient_rows[0]
+    assert patient.age == "45 years old"
+    assert patient.age_num == 45.0
+    assert ui_session_state.patient_options["condition"] == ["diabetes"]
+
+def test_patient_without_age_is_kept(ui_session_state):
+    ui_app.update_session_data(_patient_result())
+    
+    patient = ui_session_state.patient_rows[0]
+    assert patient.name == "John Doe"
+    assert patient.age is None
+    assert patient.age_num is None
+
+def test_age_num_regex_takes_leading_number():
+    assert ui_app._AGE_NUM_RE.search("about 72 years").group() == "72"
+    assert ui_app._AGE_NUM_RE.search("elderly") is None
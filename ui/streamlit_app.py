@@ -1,12 +1,18 @@
 import streamlit as st # type: ignore
-import requests
-import json
+import httpx
+import orjson
 import plotly.graph_objects as go # type: ignore
-import plotly.express as px # type: ignore
-from datetime import datetime
-from typing import Dict, Any, List, Optional
+from plotly.colors import qualitative # type: ignore
+from plotly.subplots import make_subplots # type: ignore
+import time
+from typing import Dict, Any, List, Optional, Tuple
 import pandas as pd
+import numpy as np
 import uuid
+import re
+from bisect import insort
+from collections import namedtuple, deque, Counter
+from itertools import chain
 
 # Configure page
 st.set_page_config(
@@ -15,8 +21,8 @@ st.set_page_config(
     layout="wide"
 )
 
-# Custom CSS
-st.markdown("""
+# Custom CSS, kept as one module-level string and injected once per run
+CSS = """
     <style>
     .main {
         padding: 0rem 1rem;
@@ -27,19 +33,6 @@ st.markdown("""
         border-radius: 10px;
         box-shadow: 0 2px 4px rgba(0,0,0,0.05);
     }
-    .chart-container {
-        background-color: white;
-        padding: 20px;
-        border-radius: 10px;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-    .extracted-info {
-        background-color: #ffffff;
-        padding: 20px;
-        border-radius: 10px;
-        border: 1px solid #e0e0e0;
-        margin: 10px 0;
-    }
     .info-category {
         color: #1f77b4;
         font-weight: bold;
@@ -64,6 +57,13 @@ st.markdown("""
         text-align: center;
         margin: 10px 0;
     }
+    .metric-row {
+        display: flex;
+        gap: 1rem;
+    }
+    .metric-row .metric-card {
+        flex: 1;
+    }
     .metric-card h3 {
         color: #2C3E50;
         font-size: 1rem;
@@ -75,21 +75,6 @@ st.markdown("""
         font-weight: bold;
         margin: 0;
     }
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 24px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        white-space: pre-wrap;
-        background-color: #fff;
-        border-radius: 4px;
-        color: #2C3E50;
-        box-shadow: 0 1px 2px rgba(0,0,0,0.1);
-    }
-    .stTabs [aria-selected="true"] {
-        background-color: #3498DB !important;
-        color: white !important;
-    }
     .chat-container {
         display: flex;
         align-items: flex-start;
@@ -156,55 +141,128 @@ st.markdown("""
         text-align: left;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(CSS, unsafe_allow_html=True)
+
+# Chat history bounds: messages kept in session state / rendered per rerun
+MAX_HISTORY = 200
+MAX_RENDER = 50
+# Only the most recent responses get interactive charts without asking
+MAX_LIVE_CHARTS = 5
+# Leading number in free-text ages such as "45 years old"
+_AGE_NUM_RE = re.compile(r"\d+")
+
+# Pie charts fold everything past this many slices into "Other"
+MAX_PIE_SLICES = 15
+
+# Layout shared by the dashboard and data-view charts
+DEFAULT_LAYOUT = dict(
+    margin=dict(t=40, b=20, l=20, r=20),
+    paper_bgcolor='white',
+    plot_bgcolor='white',
+    font={'color': "#2C3E50", 'family': "Arial"}
+)
+
+# Patient record as stored in session state
+PatientRow = namedtuple('PatientRow', 'name age gender condition age_num')
+MedicationRow = namedtuple('MedicationRow', 'patient medication dosage frequency')
+AppointmentRow = namedtuple('AppointmentRow', 'patient date time department')
 
 # Initialize session state
-if "messages" not in st.session_state:
-    st.session_state.messages = []
 if "conversation_history" not in st.session_state:
     st.session_state.conversation_history = []
 if "chat_history" not in st.session_state:  # Add this
-    st.session_state.chat_history = []
+    st.session_state.chat_history = deque(maxlen=MAX_HISTORY)
 if "last_response" not in st.session_state:
     st.session_state.last_response = None
-if "processed_texts" not in st.session_state:
-    st.session_state.processed_texts = []
-if "patients" not in st.session_state:
-    st.session_state.patients = pd.DataFrame(columns=['name', 'age', 'gender', 'condition'])
-if "medications" not in st.session_state:
-    st.session_state.medications = pd.DataFrame(columns=['patient', 'medication', 'dosage', 'frequency'])
-if "appointments" not in st.session_state:
-    st.session_state.appointments = pd.DataFrame(columns=['patient', 'date', 'time', 'department'])
+if "entity_cols" not in st.session_state:
+    # Columnar (SoA) store of every extracted entity, one list per field
+    st.session_state.entity_cols = {'text_idx': [], 'cat': [], 'type': [], 'text': [], 'conf': [], 'ts': []}
+if "stats" not in st.session_state:
+    # Dashboard aggregates, maintained incrementally at ingest time
+    st.session_state.stats = {"texts": 0, "intents": Counter(), "entity_types": Counter(), "conditions": 0}
+if "recent" not in st.session_state:
+    # Pre-formatted Recent Activity rows, newest last
+    st.session_state.recent = deque(maxlen=5)
+if "patient_rows" not in st.session_state:
+    st.session_state.patient_rows = []
+if "patient_options" not in st.session_state:
+    # Sorted filter options for the Patients tab, grown as patients are added
+    st.session_state.patient_options = {'condition': [], 'gender': []}
+if "medication_rows" not in st.session_state:
+    st.session_state.medication_rows = []
+if "appointment_rows" not in st.session_state:
+    st.session_state.appointment_rows = []
+
+API_URL = "http://localhost:8000/api/process"
+
+@st.cache_resource
+def get_client() -> httpx.Client:
+    """Shared HTTP client whose keep-alive connection pool survives script reruns"""
+    return httpx.Client(
+        timeout=httpx.Timeout(30, connect=3),
+        limits=httpx.Limits(max_keepalive_connections=4, max_connections=10),
+        transport=httpx.HTTPTransport(retries=2)
+    )
+
+class _UncachedReply(Exception):
+    """Carries an unsuccessful API reply out of _cached_api_call so it is not cached"""
+    def __init__(self, reply: Dict[str, Any]):
+        super().__init__(reply.get("error"))
+        self.reply = reply
+
+@st.cache_data(ttl=300, max_entries=256, show_spinner=False)
+def _cached_api_call(text: str, history: tuple) -> Dict[str, Any]:
+    """POST a command to the API; repeated (text, history) pairs are served from cache"""
+    # orjson on both sides of the wire instead of the stdlib json httpx uses
+    response = get_client().post(
+        API_URL,
+        content=orjson.dumps({
+            "text": text,
+            "conversation_history": list(history)
+        }),
+        headers={"Content-Type": "application/json"}
+    )
+    response.raise_for_status()
+    try:
+        reply = orjson.loads(response.content)
+    except orjson.JSONDecodeError as e:
+        # A non-JSON body (proxy error page, truncated reply) is a failed call, not a result
+        raise _UncachedReply({"success": False, "error": f"Invalid API response: {e}"})
+    # Raising skips the cache, so a failed processing attempt is retried next time
+    if not reply.get("success"):
+        raise _UncachedReply(reply)
+    return reply
 
 def process_command(text: str) -> Dict[str, Any]:
     """Send command to API and get response"""
-    api_url = "http://localhost:8000/api/process"
-    
     try:
-        response = requests.post(
-            api_url,
-            json={
-                "text": text,
-                "conversation_history": st.session_state.conversation_history
-            }
-        )
-        response.raise_for_status()
-        result = response.json()
+        # cache_data hands back a copy, so the result can be mutated below
+        try:
+            result = _cached_api_call(text, tuple(st.session_state.conversation_history))
+        except _UncachedReply as e:
+            result = e.reply
         
         # Debug print
         print("API Response:", result)
         
         # Update session state with processed data
         if result["success"]:
-            st.session_state.processed_texts.append(result["result"])
+            # One (category, type) index per result, shared by the follow-up check and the record builders
+            result["result"]["_first"] = index_first_entities(result["result"])
+            # Stamp the result once; every entity and table row reuses this value
+            result["result"]["_ingest_ts"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            # Only the count of processed results is kept; entity rows index into it
+            st.session_state.stats["texts"] += 1
+            append_entity_cols(result["result"])
             update_session_data(result["result"])
             
             # Explicitly check for medication-related intent and add follow-up
             if result["result"]["intent"]["primary_intent"] == "assign_medication":
-                med_entities = result["result"]["entities"].get("medical_info", [])
-                medication = next((e["text"] for e in med_entities if e["type"] == "medication"), None)
-                dosage = next((e["text"] for e in med_entities if e["type"] == "dosage"), None)
-                frequency = next((e["text"] for e in med_entities if e["type"] == "frequency"), None)
+                first = result["result"]["_first"]
+                medication = first.get(("medical_info", "medication"))
+                dosage = first.get(("medical_info", "dosage"))
+                frequency = first.get(("medical_info", "frequency"))
                 
                 if medication and not dosage:
                     result["result"]["follow_up_question"] = f"What is the dosage for {medication}?"
@@ -212,123 +270,162 @@ def process_command(text: str) -> Dict[str, Any]:
                     result["result"]["follow_up_question"] = f"How often should {medication} be taken?"
             
         return result
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         st.error(f"API Error: {str(e)}")
         return {"success": False, "error": str(e)}
 
+def index_first_entities(result: Dict[str, Any]) -> Dict[Tuple[str, str], str]:
+    """Map each (category, type) pair to the text of its first occurrence in a result"""
+    first = {}
+    for category, items in result.get('entities', {}).items():
+        for e in items:
+            first.setdefault((category, e['type']), e['text'])
+    return first
+
+def append_entity_cols(result: Dict[str, Any]):
+    """Extend the columnar entity store with the entities of one processed text"""
+    cols = st.session_state.entity_cols
+    text_idx = st.session_state.stats["texts"] - 1
+    for category, items in result.get('entities', {}).items():
+        cols['text_idx'].extend([text_idx] * len(items))
+        cols['cat'].extend([category] * len(items))
+        cols['type'].extend(e['type'] for e in items)
+        cols['text'].extend(e['text'] for e in items)
+        cols['conf'].extend(e.get('confidence') for e in items)
+        cols['ts'].extend([result['_ingest_ts']] * len(items))
+
+def _memo_df(name: str, version: int, build) -> pd.DataFrame:
+    """Rebuild a session DataFrame only when its append-only source has grown"""
+    # Callers derive new frames (query/loc/rename) and never mutate the cached one
+    slot = f"_{name}_df"
+    cached = st.session_state.get(slot)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    df = build()
+    st.session_state[slot] = (version, df)
+    return df
+
+def get_patients_df() -> pd.DataFrame:
+    """Materialize the accumulated patient rows as a DataFrame in one pass"""
+    rows = st.session_state.patient_rows
+    return _memo_df('patients', len(rows),
+                    lambda: pd.DataFrame.from_records(rows, columns=PatientRow._fields))
+
+def get_entity_df() -> pd.DataFrame:
+    """Build the entity analysis DataFrame over the columnar store for vectorized aggregation"""
+    cols = st.session_state.entity_cols
+    # Display names and categorical label columns are set once per data version,
+    # so the tabs only compute filter masks over the integer codes
+    return _memo_df('entity', len(cols['type']), lambda: pd.DataFrame({
+        'category': pd.Categorical(cols['cat']),
+        'type': pd.Categorical(cols['type']),
+        'value': cols['text'],
+        'confidence': cols['conf'],
+        'timestamp': cols['ts'],
+    }))
+
+def _category_codes(col: pd.Series, selected: List[str]) -> np.ndarray:
+    """Translate selected labels into the integer codes of a categorical column"""
+    categories = col.cat.categories
+    return np.array([categories.get_loc(c) for c in selected if c in categories], dtype=np.int32)
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _unique_sorted(col: pd.Series) -> List[str]:
+    """Return the sorted distinct values of a column as strings for filter options"""
+    # Streamlit hashes the Series by content, so this only recomputes when the column changes
+    return sorted({str(v) for v in col.dropna().unique()})
+
 def update_session_data(result: Dict[str, Any]):
     """Update session state with processed data"""
     intent = result.get('intent', {}).get('primary_intent')
     
+    # Keep the dashboard aggregates current
+    stats = st.session_state.stats
+    stats["intents"][intent] += 1
+    for category, items in result.get('entities', {}).items():
+        types = [e['type'] for e in items]
+        stats["entity_types"].update(types)
+        if category == 'medical_info':
+            stats["conditions"] += types.count('condition')
+    
+    # First text of each (category, type) pair, indexed once in process_command
+    first = result['_first']
+    st.session_state.recent.append({
+        'Timestamp': result.get('_ingest_ts'),
+        'Intent': intent,
+        'Confidence': f"{result['intent']['confidence']:.2%}",
+        'Entities': sum(len(items) for items in result.get('entities', {}).values())
+    })
+    
     # Update patients dataframe if intent is to add patient
     if intent == "add_patient":
-        entities = result.get('entities', {})
-        patient_info = entities.get('patient_info', [])
-        medical_info = entities.get('medical_info', [])
-        temporal_info = entities.get('temporal_info', [])
-        
         # Extract patient data with improved age handling
-        patient_data = {
-            'name': next((e['text'] for e in patient_info if e['type'] == 'patient'), None),
-            'age': next((e['text'] for e in temporal_info if e['type'] == 'age'), None),
-            'gender': next((e['text'] for e in patient_info if e['type'] == 'gender'), None),
-            'condition': next((e['text'] for e in medical_info if e['type'] == 'condition'), None)
-        }
+        age = first.get(('temporal_info', 'age'))
         
         # If age not found in temporal_info, try demographics in patient_info
-        if not patient_data['age']:
-            demographics = next((e['text'] for e in patient_info if e['type'] == 'demographics'), None)
+        if not age:
+            demographics = first.get(('patient_info', 'demographics'))
             if demographics and 'years old' in demographics:
-                patient_data['age'] = demographics
+                age = demographics
+        
+        # Parse the numeric age once here rather than on every filter interaction
+        age_match = _AGE_NUM_RE.search(age) if age else None
+        
+        patient_data = PatientRow(
+            name=first.get(('patient_info', 'patient')),
+            age=age,
+            gender=first.get(('patient_info', 'gender')),
+            condition=first.get(('medical_info', 'condition')),
+            age_num=float(age_match.group()) if age_match else None
+        )
 
         print("Extracted patient data:", patient_data)  # Debug print
         
-        # Only add patient if we have at least a name
-        if patient_data['name']:
-            try:
-                # Create new DataFrame with the same columns as st.session_state.patients
-                new_patient_df = pd.DataFrame([patient_data], columns=['name', 'age', 'gender', 'condition'])
-                
-                # Check if patients DataFrame exists and initialize if it doesn't
-                if 'patients' not in st.session_state:
-                    st.session_state.patients = pd.DataFrame(columns=['name', 'age', 'gender', 'condition'])
-                
-                # Concatenate with existing patients
-                st.session_state.patients = pd.concat(
-                    [st.session_state.patients, new_patient_df], 
-                    ignore_index=True,
-                    axis=0
-                )
-                
-                # Remove any duplicate entries based on all columns
-                st.session_state.patients = st.session_state.patients.drop_duplicates()
-                
-                print("Updated patients DataFrame:")  # Debug print
-                print(st.session_state.patients)
-                
-            except Exception as e:
-                print(f"Error adding patient to DataFrame: {str(e)}")
-                raise
+        # Only add patient if we have at least a name, skipping exact duplicates
+        if patient_data.name and patient_data not in st.session_state.patient_rows:
+            st.session_state.patient_rows.append(patient_data)
+            for field, options in st.session_state.patient_options.items():
+                value = getattr(patient_data, field)
+                if value is not None and value not in options:
+                    insort(options, value)
     
     # Update medications dataframe if intent is to assign medication
     elif intent == "assign_medication":
-        entities = result.get('entities', {})
-        patient_info = entities.get('patient_info', [])
-        medical_info = entities.get('medical_info', [])
-        
-        medication_data = {
-            'patient': next((e['text'] for e in patient_info if e['type'] == 'patient'), None),
-            'medication': next((e['text'] for e in medical_info if e['type'] == 'medication'), None),
-            'dosage': next((e['text'] for e in medical_info if e['type'] == 'dosage'), None),
-            'frequency': next((e['text'] for e in medical_info if e['type'] == 'frequency'), None)
-        }
+        medication_data = MedicationRow(
+            patient=first.get(('patient_info', 'patient')),
+            medication=first.get(('medical_info', 'medication')),
+            dosage=first.get(('medical_info', 'dosage')),
+            frequency=first.get(('medical_info', 'frequency'))
+        )
         
-        if medication_data['patient'] and medication_data['medication']:
-            try:
-                new_medication_df = pd.DataFrame([medication_data])
-                if 'medications' not in st.session_state:
-                    st.session_state.medications = pd.DataFrame(columns=['patient', 'medication', 'dosage', 'frequency'])
-                st.session_state.medications = pd.concat([st.session_state.medications, new_medication_df], ignore_index=True)
-            except Exception as e:
-                print(f"Error adding medication to DataFrame: {str(e)}")
+        if medication_data.patient and medication_data.medication:
+            st.session_state.medication_rows.append(medication_data)
     
     # Update appointments dataframe if intent is to schedule appointment
     elif intent == "schedule_appointment":
-        entities = result.get('entities', {})
-        patient_info = entities.get('patient_info', [])
-        temporal_info = entities.get('temporal_info', [])
-        location_info = entities.get('location_info', [])
-        
-        appointment_data = {
-            'patient': next((e['text'] for e in patient_info if e['type'] == 'patient'), None),
-            'date': next((e['text'] for e in temporal_info if e['type'] == 'date'), None),
-            'time': next((e['text'] for e in temporal_info if e['type'] == 'time'), None),
-            'department': next((e['text'] for e in location_info if e['type'] == 'department'), None)
-        }
+        appointment_data = AppointmentRow(
+            patient=first.get(('patient_info', 'patient')),
+            date=first.get(('temporal_info', 'date')),
+            time=first.get(('temporal_info', 'time')),
+            department=first.get(('location_info', 'department'))
+        )
         
-        if appointment_data['patient'] and appointment_data['date']:
-            try:
-                new_appointment_df = pd.DataFrame([appointment_data])
-                if 'appointments' not in st.session_state:
-                    st.session_state.appointments = pd.DataFrame(columns=['patient', 'date', 'time', 'department'])
-                st.session_state.appointments = pd.concat([st.session_state.appointments, new_appointment_df], ignore_index=True)
-            except Exception as e:
-                print(f"Error adding appointment to DataFrame: {str(e)}")
+        if appointment_data.patient and appointment_data.date:
+            st.session_state.appointment_rows.append(appointment_data)
 
     # Print debug information
     print("Current session state:")
-    print(f"Patients: {len(st.session_state.patients)} records")
-    print(st.session_state.patients)
-    print(f"Medications: {len(st.session_state.medications)} records")
-    print(f"Appointments: {len(st.session_state.appointments)} records")
+    print(f"Patients: {len(st.session_state.patient_rows)} records")
+    print(f"Medications: {len(st.session_state.medication_rows)} records")
+    print(f"Appointments: {len(st.session_state.appointment_rows)} records")
 
 
-def display_intent_confidence(intent: Dict[str, Any], chart_id: str):
-    """Display intent classification results with improved gauge"""
+@st.cache_resource
+def _gauge_template() -> go.Figure:
+    """Build the intent gauge scaffolding once; value and title are set at render time"""
     fig = go.Figure(go.Indicator(
         mode="gauge+number",
-        value=intent["confidence"] * 100,
-        title={'text': f"Intent: {intent['primary_intent']}", 'font': {'size': 24}},
+        title={'font': {'size': 24}},
         gauge={
             'axis': {'range': [None, 100], 'tickwidth': 1},
             'bar': {'color': "#1f77b4"},
@@ -349,26 +446,21 @@ def display_intent_confidence(intent: Dict[str, Any], chart_id: str):
         paper_bgcolor="white",
         font={'color': "#2C3E50", 'family': "Arial"}
     )
-    
-    st.plotly_chart(fig, use_container_width=True, key=f"intent_gauge_{chart_id}")
+    return fig
 
-def visualize_entities(entities: Dict[str, List]) -> go.Figure:
-    """Create enhanced visualization for extracted entities"""
-    categories = []
-    values = []
-    colors = ['#AED6F1', '#3498DB', '#2980B9']
-    
-    for category, items in entities.items():
-        if items:
-            categories.append(category.replace('_', ' ').title())
-            values.append(len(items))
-    
+# Fixed bar colour per entity category, so a category keeps its colour across responses
+_CATEGORY_PALETTE = {
+    'Patient Info': '#AED6F1',
+    'Medical Info': '#3498DB',
+    'Temporal Info': '#2980B9',
+    'Location Info': '#1B4F72',
+}
+
+@st.cache_resource
+def _entity_bar_template() -> go.Figure:
+    """Build the entity bar chart scaffolding once; data is set at render time"""
     fig = go.Figure(data=[
         go.Bar(
-            x=categories,
-            y=values,
-            marker_color=colors,
-            text=values,
             textposition='auto',
         )
     ])
@@ -383,16 +475,60 @@ def visualize_entities(entities: Dict[str, List]) -> go.Figure:
         },
         xaxis_title="Entity Category",
         yaxis_title="Count",
-        template="plotly_white",
+        template="simple_white",
+        # Static categorical counts: no hover tracking or gridlines to draw
+        hovermode=False,
+        xaxis=dict(showgrid=False, zeroline=False),
+        yaxis=dict(showgrid=False, zeroline=False),
         height=300,
         margin=dict(t=40, b=0, l=0, r=0),
         paper_bgcolor="white",
         plot_bgcolor="white",
         font={'color': "#2C3E50", 'family': "Arial"}
     )
+    return fig
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _intent_gauge(primary_intent: str, confidence_pct: int) -> go.Figure:
+    """Gauge for one (intent, whole-percent confidence) pair; cache_data hands every caller its own copy"""
+    fig = go.Figure(_gauge_template())
+    fig.update_traces(
+        value=confidence_pct,
+        title_text=f"Intent: {primary_intent}"
+    )
+    
+    return fig
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _entity_bars(counts: tuple) -> go.Figure:
+    """Bar chart for a tuple of (category label, count) pairs"""
+    categories = [label for label, _ in counts]
+    values = [count for _, count in counts]
+    
+    fig = go.Figure(_entity_bar_template())
+    fig.update_traces(
+        x=categories,
+        y=values,
+        text=values,
+        marker_color=[_CATEGORY_PALETTE.get(label, '#85929E') for label in categories]
+    )
     
     return fig
 
+def build_intent_gauge(intent: Dict[str, Any]) -> go.Figure:
+    """Create intent classification gauge"""
+    # Bucket to whole percents so near-identical confidences share a cache entry
+    return _intent_gauge(intent['primary_intent'], int(round(intent['confidence'] * 100)))
+
+def visualize_entities(entities: Dict[str, List]) -> go.Figure:
+    """Create enhanced visualization for extracted entities"""
+    counts = tuple(
+        (category.replace('_', ' ').title(), len(items))
+        for category, items in entities.items()
+        if items
+    )
+    return _entity_bars(counts)
+
 def display_extracted_info(result: Dict[str, Any]):
     # Helper function to safely get entities
     def get_entities(category: str) -> List[Dict[str, Any]]:
@@ -466,85 +602,110 @@ def display_extracted_info(result: Dict[str, Any]):
         "entities": entities
     }
     
-    st.code(json.dumps(simplified, indent=2), language="json")
+    st.code(orjson.dumps(simplified, option=orjson.OPT_INDENT_2).decode(), language="json")
+
+def _top_counts(col: pd.Series, limit: int = MAX_PIE_SLICES) -> pd.Series:
+    """Value counts capped at `limit` entries, with the remainder summed into 'Other'"""
+    counts = col.value_counts()
+    counts = counts[counts > 0]
+    if len(counts) > limit:
+        counts = pd.concat([counts.iloc[:limit], pd.Series({'Other': counts.iloc[limit:].sum()})])
+    return counts
+
+def _type_counts(filtered: pd.DataFrame, selected_categories: List[str], selected_types: List[str]) -> pd.Series:
+    """Entity type counts for the current filter selection, memoized per session"""
+    # The entity store only grows, so its length versions the data
+    key = (
+        len(st.session_state.entity_cols['type']),
+        tuple(sorted(selected_categories)),
+        tuple(sorted(selected_types))
+    )
+    cached = st.session_state.get('_type_counts')
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    
+    counts = filtered['type'].value_counts(dropna=False, sort=False).sort_values(ascending=False)
+    counts = counts[counts > 0]  # Drop filtered-out categories
+    st.session_state._type_counts = (key, counts)
+    return counts
+
+def _quantile_box(df: pd.DataFrame, group_col: str, value_col: str, title: str) -> go.Figure:
+    """Box plot drawn from per-group quartiles so only 5 numbers per group reach the browser"""
+    values = pd.to_numeric(df[value_col], errors='coerce')
+    q = values.groupby(df[group_col], observed=True).quantile([0.0, 0.25, 0.5, 0.75, 1.0]).unstack()
+    # Nothing selected: unstack yields no quantile columns, so draw an empty chart
+    if q.empty:
+        fig = go.Figure()
+        fig.update_layout(title=title, **DEFAULT_LAYOUT)
+        return fig
+    fig = go.Figure(go.Box(
+        x=q.index.astype(str).tolist(),
+        lowerfence=q[0.0],
+        q1=q[0.25],
+        median=q[0.5],
+        q3=q[0.75],
+        upperfence=q[1.0],
+        marker_color='#3498DB'
+    ))
+    fig.update_layout(title=title, **DEFAULT_LAYOUT)
+    return fig
+
+_METRIC_CARD_TMPL = '<div class="metric-card"><h3>{title}</h3><p class="metric-value">{value}</p></div>'
 
 def show_dashboard():
     """Display enhanced dashboard page"""
     st.title("Medical NLP Dashboard 🏥")
+    stats = st.session_state.stats
     
-    # Summary Cards in a row
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        st.markdown("""
-            <div class="metric-card">
-                <h3>Total Patients</h3>
-                <p class="metric-value">{}</p>
-            </div>
-        """.format(len(st.session_state.patients)), unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown("""
-            <div class="metric-card">
-                <h3>Total Intents</h3>
-                <p class="metric-value">{}</p>
-            </div>
-        """.format(len(st.session_state.processed_texts)), unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown("""
-            <div class="metric-card">
-                <h3>Total Conditions</h3>
-                <p class="metric-value">{}</p>
-            </div>
-        """.format(len([item for text in st.session_state.processed_texts 
-                       for item in text['entities'].get('medical_info', [])
-                       if item['type'] == 'condition'])), unsafe_allow_html=True)
-    
-    with col4:
-        st.markdown("""
-            <div class="metric-card">
-                <h3>Processing Accuracy</h3>
-                <p class="metric-value">98.4%</p>
-            </div>
-        """.format(), unsafe_allow_html=True)
+    # Summary Cards in a row, emitted as a single markdown block
+    cards = [
+        ("Total Patients", len(st.session_state.patient_rows)),
+        ("Total Intents", stats["texts"]),
+        ("Total Conditions", stats["conditions"]),
+        ("Processing Accuracy", "98.4%"),
+    ]
+    st.markdown(
+        '<div class="metric-row">' +
+        "".join(_METRIC_CARD_TMPL.format(title=title, value=value) for title, value in cards) +
+        '</div>',
+        unsafe_allow_html=True
+    )
 
     # Charts Section
     st.markdown("### Analytics Overview")
     col1, col2 = st.columns(2)
     
     with col1:
-        if st.session_state.processed_texts:
+        if stats["texts"]:
             # Intent Distribution
-            intents = [text['intent']['primary_intent'] for text in st.session_state.processed_texts]
-            intent_counts = pd.Series(intents).value_counts()
+            intent_counts = stats["intents"].most_common()
             
-            fig = px.pie(
-                values=intent_counts.values,
-                names=intent_counts.index,
-                title="Intent Distribution",
+            fig = go.Figure(go.Pie(
+                values=[count for _, count in intent_counts],
+                labels=[intent for intent, _ in intent_counts],
                 hole=0.4,
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
+                marker_colors=qualitative.Set3
+            ))
+            fig.update_layout(title="Intent Distribution", **DEFAULT_LAYOUT)
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No intent data available yet")
 
     with col2:
-        if st.session_state.processed_texts:
+        if stats["texts"]:
             # Entity Types Distribution
-            entity_types = []
-            for text in st.session_state.processed_texts:
-                for category in text['entities'].values():
-                    entity_types.extend([item['type'] for item in category])
-            
-            entity_counts = pd.Series(entity_types).value_counts()
+            entity_counts = stats["entity_types"].most_common()
             
-            fig = px.bar(
-                x=entity_counts.index,
-                y=entity_counts.values,
+            fig = go.Figure(go.Bar(
+                x=[entity_type for entity_type, _ in entity_counts],
+                y=[count for _, count in entity_counts],
+                marker_color='#3498DB'
+            ))
+            fig.update_layout(
                 title="Entity Types Distribution",
-                labels={'x': 'Entity Type', 'y': 'Count'},
-                color_discrete_sequence=['#3498DB']
+                xaxis_title="Entity Type",
+                yaxis_title="Count",
+                **DEFAULT_LAYOUT
             )
             st.plotly_chart(fig, use_container_width=True)
         else:
@@ -552,16 +713,8 @@ def show_dashboard():
 
     # Recent Activity
     st.markdown("### Recent Activity")
-    if st.session_state.processed_texts:
-        recent_df = pd.DataFrame([
-            {
-                'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'Intent': text['intent']['primary_intent'],
-                'Confidence': f"{text['intent']['confidence']:.2%}",
-                'Entities': len([item for category in text['entities'].values() for item in category])
-            }
-            for text in st.session_state.processed_texts[-5:]  # Last 5 entries
-        ])
+    if stats["texts"]:
+        recent_df = pd.DataFrame(list(st.session_state.recent))
         st.dataframe(recent_df, use_container_width=True)
     else:
         st.info("No recent activity to display")
@@ -570,375 +723,283 @@ def show_data_views():
     """Display enhanced data views page"""
     st.title("Medical Data Views 📊")
     
-    # Create tabs with custom styling
-    st.markdown("""
-        <style>
-        .stTabs [data-baseweb="tab-list"] {
-            gap: 24px;
-        }
-        .stTabs [data-baseweb="tab"] {
-            height: 50px;
-            white-space: pre-wrap;
-            background-color: #fff;
-            border-radius: 4px;
-            color: #2C3E50;
-            box-shadow: 0 1px 2px rgba(0,0,0,0.1);
-            padding: 0 20px;
-            font-size: 16px;
-        }
-        .stTabs [aria-selected="true"] {
-            background-color: #3498DB !important;
-            color: white !important;
-        }
-        .data-container {
-            background-color: white;
-            padding: 20px;
-            border-radius: 10px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            margin: 10px 0;
-        }
-        .filter-container {
-            background-color: #f8f9fa;
-            padding: 15px;
-            border-radius: 5px;
-            margin: 10px 0;
-        }
-        </style>
-    """, unsafe_allow_html=True)
-    
-    tabs = st.tabs(["Patients", "Medical Records", "Entity Analysis"])
-    
-    with tabs[0]:  # Patients Tab
-        st.markdown("### Patient Records")
-        if not st.session_state.patients.empty:
-            # Filters in a styled container
-            st.markdown('<div class="filter-container">', unsafe_allow_html=True)
+    # st.tabs would run every tab body on each rerun; a selector runs only the
+    # active one. Each tab is also a fragment, so its filters rerun only that tab.
+    active_tab = st.radio(
+        "View",
+        list(_DATA_VIEW_TABS),
+        horizontal=True,
+        key="active_tab",
+        label_visibility="collapsed"
+    )
+    _DATA_VIEW_TABS[active_tab]()
+
+@st.fragment
+def _patients_tab():
+    """Patients tab: records table, filters and demographics"""
+    st.markdown("### Patient Records")
+    patients_df = get_patients_df()
+    if not patients_df.empty:
+        # Filters in a bordered container
+        with st.container(border=True):
             col1, col2, col3 = st.columns(3)
             with col1:
                 age_filter = st.slider("Filter by Age", 0, 100, (0, 100))
             with col2:
-                # Safely handle conditions
-                conditions = st.session_state.patients['condition'].dropna().unique()
-                all_conditions = sorted([str(c) for c in conditions if c is not None])
+                # Options are kept sorted at ingest
+                all_conditions = st.session_state.patient_options['condition']
                 condition_filter = st.multiselect(
                     "Filter by Condition",
                     options=all_conditions,
                     default=[]
                 ) if all_conditions else []
             with col3:
-                # Safely handle genders
-                genders = st.session_state.patients['gender'].dropna().unique()
-                all_genders = sorted([str(g) for g in genders if g is not None])
+                all_genders = st.session_state.patient_options['gender']
                 gender_filter = st.multiselect(
                     "Filter by Gender",
                     options=all_genders,
                     default=[]
                 ) if all_genders else []
-            st.markdown('</div>', unsafe_allow_html=True)
-            
-            # Apply filters
-            filtered_df = st.session_state.patients.copy()
-            
-            # Handle age filtering safely
-            try:
-                # Extract numeric age values safely
-                filtered_df['age_num'] = filtered_df['age'].apply(
-                    lambda x: pd.to_numeric(str(x).split()[0]) if pd.notnull(x) else None
-                )
-                age_mask = (
-                    filtered_df['age_num'].notna() & 
-                    (filtered_df['age_num'] >= age_filter[0]) & 
-                    (filtered_df['age_num'] <= age_filter[1])
-                )
-                filtered_df = filtered_df[age_mask]
-                filtered_df = filtered_df.drop('age_num', axis=1)
-            except Exception as e:
-                st.warning("Some age values couldn't be processed. Showing all ages.")
-            
-            # Handle condition filtering safely
-            if condition_filter:
-                filtered_df = filtered_df[
-                    filtered_df['condition'].fillna('').astype(str).isin(condition_filter)
-                ]
-            
-            # Handle gender filtering safely
-            if gender_filter:
-                filtered_df = filtered_df[
-                    filtered_df['gender'].fillna('').astype(str).isin(gender_filter)
-                ]
-            
-            # Display filtered data
-            st.markdown('<div class="data-container">', unsafe_allow_html=True)
+        
+        # Combine all filters into one NumPy mask and select the rows once;
+        # patients without a parseable age are kept while the slider spans its full range
+        lo, hi = age_filter
+        ages = patients_df['age_num'].to_numpy(dtype=float)
+        mask = (ages >= lo) & (ages <= hi)
+        if (lo, hi) == (0, 100):
+            mask |= np.isnan(ages)
+        if condition_filter:
+            mask &= patients_df['condition'].isin(condition_filter).to_numpy()
+        if gender_filter:
+            mask &= patients_df['gender'].isin(gender_filter).to_numpy()
+        
+        filtered_df = patients_df[mask]
+        
+        # Display filtered data
+        with st.container(border=True):
+            # Nulls are carried natively by the Arrow payload, no string-filled copy needed
             st.dataframe(
-                filtered_df.fillna('Not specified'),
+                filtered_df,
                 hide_index=True,
-                use_container_width=True
+                use_container_width=True,
+                column_config={"age_num": None}
             )
-            st.markdown('</div>', unsafe_allow_html=True)
+        
+        # Demographics visualizations
+        if not filtered_df.empty:
+            st.markdown("#### Patient Demographics")
+            age_data = filtered_df['age_num'].dropna()
+            condition_counts = filtered_df['condition'].dropna().value_counts()
+            gender_counts = filtered_df['gender'].dropna().value_counts()
             
-            # Demographics visualizations
-            if not filtered_df.empty:
-                st.markdown("#### Patient Demographics")
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    try:
-                        age_data = filtered_df['age'].dropna().apply(
-                            lambda x: pd.to_numeric(str(x).split()[0])
-                        )
-                        if not age_data.empty:
-                            fig = px.histogram(
-                                age_data,
-                                nbins=20,
-                                title="Age Distribution",
-                                labels={'value': 'Age', 'count': 'Number of Patients'},
-                                color_discrete_sequence=['#3498DB']
-                            )
-                            fig.update_layout(
-                                plot_bgcolor='white',
-                                paper_bgcolor='white',
-                                margin=dict(t=40, b=20, l=20, r=20)
-                            )
-                            st.plotly_chart(fig, use_container_width=True)
-                    except Exception as e:
-                        st.info("Age distribution visualization unavailable")
-                
-                with col2:
-                    try:
-                        condition_counts = filtered_df['condition'].dropna().value_counts()
-                        if not condition_counts.empty:
-                            fig = px.pie(
-                                values=condition_counts.values,
-                                names=condition_counts.index,
-                                title="Condition Distribution",
-                                color_discrete_sequence=px.colors.qualitative.Set3
-                            )
-                            fig.update_layout(
-                                margin=dict(t=40, b=20, l=20, r=20)
-                            )
-                            st.plotly_chart(fig, use_container_width=True)
-                    except Exception as e:
-                        st.info("Condition distribution visualization unavailable")
-                
-                with col3:
-                    try:
-                        gender_counts = filtered_df['gender'].dropna().value_counts()
-                        if not gender_counts.empty:
-                            fig = px.pie(
-                                values=gender_counts.values,
-                                names=gender_counts.index,
-                                title="Gender Distribution",
-                                color_discrete_sequence=px.colors.qualitative.Set2
-                            )
-                            fig.update_layout(
-                                margin=dict(t=40, b=20, l=20, r=20)
-                            )
-                            st.plotly_chart(fig, use_container_width=True)
-                    except Exception as e:
-                        st.info("Gender distribution visualization unavailable")
-            else:
-                st.info("No data available for the selected filters")
+            # One figure for all three charts: a single payload and render pass
+            fig = make_subplots(
+                rows=1, cols=3,
+                specs=[[{'type': 'xy'}, {'type': 'domain'}, {'type': 'domain'}]],
+                subplot_titles=("Age Distribution", "Condition Distribution", "Gender Distribution")
+            )
+            fig.add_trace(go.Histogram(
+                x=age_data,
+                nbinsx=20,
+                name="Age",
+                marker_color='#3498DB'
+            ), row=1, col=1)
+            fig.add_trace(go.Pie(
+                labels=condition_counts.index,
+                values=condition_counts.values,
+                name="Condition",
+                textinfo='label+percent',
+                marker_colors=qualitative.Set3
+            ), row=1, col=2)
+            fig.add_trace(go.Pie(
+                labels=gender_counts.index,
+                values=gender_counts.values,
+                name="Gender",
+                textinfo='label+percent',
+                marker_colors=qualitative.Set2
+            ), row=1, col=3)
+            fig.update_xaxes(title_text="Age", row=1, col=1)
+            fig.update_yaxes(title_text="Number of Patients", row=1, col=1)
+            fig.update_layout(showlegend=False, **DEFAULT_LAYOUT)
+            st.plotly_chart(fig, use_container_width=True)
         else:
-            st.info("No patient data available")
+            st.info("No data available for the selected filters")
+    else:
+        st.info("No patient data available")
 
-    with tabs[1]:  # Medical Records Tab
-        st.markdown("### Medical Records Analysis")
-        if st.session_state.processed_texts:
-            # Extract medical records
-            try:
-                medical_records = []
-                for text in st.session_state.processed_texts:
-                    for item in text['entities'].get('medical_info', []):
-                        medical_records.append({
-                            'type': item['type'],
-                            'value': item['text'],
-                            'confidence': item.get('confidence', 'N/A'),
-                            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        })
-                
-                if medical_records:
-                    medical_df = pd.DataFrame(medical_records)
-                    
-                    # Filters
-                    st.markdown('<div class="filter-container">', unsafe_allow_html=True)
-                    record_types = sorted(medical_df['type'].unique().tolist())
+@st.fragment
+def _medical_records_tab():
+    """Medical records tab: record table and type/confidence charts"""
+    st.markdown("### Medical Records Analysis")
+    if st.session_state.stats["texts"]:
+        # Extract medical records
+        try:
+            entity_df = get_entity_df()
+            medical_df = entity_df.loc[
+                entity_df['category'] == 'medical_info', ['type', 'value', 'confidence', 'timestamp']
+            ]
+            
+            if not medical_df.empty:
+                # Filters
+                with st.container(border=True):
+                    record_types = _unique_sorted(medical_df['type'])
                     selected_types = st.multiselect(
                         "Filter by Record Type",
                         options=record_types,
                         default=record_types
                     )
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Apply filters
-                    filtered_records = medical_df[medical_df['type'].isin(selected_types)]
-                    
-                    # Display filtered records
-                    st.markdown('<div class="data-container">', unsafe_allow_html=True)
+                
+                # Apply filters
+                filtered_records = medical_df[medical_df['type'].isin(selected_types)]
+                
+                # Display filtered records
+                with st.container(border=True):
                     st.dataframe(
                         filtered_records,
                         hide_index=True,
                         use_container_width=True
                     )
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Visualizations
+                
+                # Visualizations: build every figure first, then emit them together
+                record_counts = _top_counts(filtered_records['type'])
+                pie_fig = go.Figure(go.Pie(
+                    values=record_counts.values.tolist(),
+                    labels=record_counts.index.tolist(),
+                    marker_colors=qualitative.Set3
+                ))
+                pie_fig.update_layout(title="Record Type Distribution", **DEFAULT_LAYOUT)
+                box_fig = _quantile_box(
+                    filtered_records, 'type', 'confidence', "Confidence by Record Type"
+                )
+                
+                # Stable keys let Streamlit update the charts in place across reruns
+                with st.container(border=True):
                     col1, col2 = st.columns(2)
-                    
                     with col1:
-                        fig = px.pie(
-                            filtered_records,
-                            names='type',
-                            title="Record Type Distribution",
-                            color_discrete_sequence=px.colors.qualitative.Set3
-                        )
-                        fig.update_layout(
-                            margin=dict(t=40, b=20, l=20, r=20)
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-                    
+                        st.plotly_chart(pie_fig, use_container_width=True, key="records_type_pie")
                     with col2:
-                        if 'confidence' in filtered_records.columns:
-                            fig = px.box(
-                                filtered_records,
-                                x='type',
-                                y='confidence',
-                                title="Confidence by Record Type",
-                                color_discrete_sequence=['#3498DB']
-                            )
-                            fig.update_layout(
-                                plot_bgcolor='white',
-                                paper_bgcolor='white',
-                                margin=dict(t=40, b=20, l=20, r=20)
-                            )
-                            st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.info("No medical records found in the processed data")
-            except Exception as e:
-                st.error(f"Error processing medical records: {str(e)}")
-        else:
-            st.info("No medical records available. Process some medical text first.")
+                        st.plotly_chart(box_fig, use_container_width=True, key="records_confidence_box")
+            else:
+                st.info("No medical records found in the processed data")
+        except Exception as e:
+            st.error(f"Error processing medical records: {str(e)}")
+    else:
+        st.info("No medical records available. Process some medical text first.")
 
-    with tabs[2]:  # Entity Analysis Tab
-        st.markdown("### Entity Analysis")
-        if st.session_state.processed_texts:
-            try:
-                # Aggregate entities
-                all_entities = []
-                for text in st.session_state.processed_texts:
-                    for category, entities in text['entities'].items():
-                        for entity in entities:
-                            all_entities.append({
-                                'category': category,
-                                'type': entity['type'],
-                                'value': entity['text'],
-                                'confidence': entity.get('confidence', 'N/A'),
-                                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                            })
-                
-                if all_entities:
-                    entity_df = pd.DataFrame(all_entities)
-                    
-                    # Filters
-                    st.markdown('<div class="filter-container">', unsafe_allow_html=True)
+@st.fragment
+def _entity_analysis_tab():
+    """Entity analysis tab: filtered entity table and distribution charts"""
+    st.markdown("### Entity Analysis")
+    if st.session_state.stats["texts"]:
+        try:
+            # Aggregate entities
+            # Category and type are already categorical, so filters run on integer codes
+            entity_df = get_entity_df()
+            
+            if not entity_df.empty:
+                # Filters
+                with st.container(border=True):
+                    all_categories = _unique_sorted(entity_df['category'])
+                    all_types = _unique_sorted(entity_df['type'])
                     col1, col2 = st.columns(2)
                     with col1:
                         selected_categories = st.multiselect(
                             "Filter by Category",
-                            options=sorted(entity_df['category'].unique()),
-                            default=entity_df['category'].unique()
+                            options=all_categories,
+                            default=all_categories
                         )
-                    
+                
                     with col2:
                         selected_types = st.multiselect(
                             "Filter by Entity Type",
-                            options=sorted(entity_df['type'].unique()),
-                            default=entity_df['type'].unique()
+                            options=all_types,
+                            default=all_types
                         )
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Apply filters
-                    filtered_entities = entity_df[
-                        (entity_df['category'].isin(selected_categories)) &
-                        (entity_df['type'].isin(selected_types))
-                    ]
-                    
-                    # Display filtered data
-                    st.markdown('<div class="data-container">', unsafe_allow_html=True)
+                
+                # Apply filters
+                mask = (
+                    np.isin(entity_df['category'].cat.codes.to_numpy(),
+                            _category_codes(entity_df['category'], selected_categories)) &
+                    np.isin(entity_df['type'].cat.codes.to_numpy(),
+                            _category_codes(entity_df['type'], selected_types))
+                )
+                filtered_entities = entity_df[mask]
+                
+                # Display filtered data
+                with st.container(border=True):
                     st.dataframe(
                         filtered_entities,
                         hide_index=True,
                         use_container_width=True
                     )
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    # Visualizations
+                
+                # Visualizations: build every figure first, then emit them together
+                category_counts = _top_counts(filtered_entities['category'])
+                pie_fig = go.Figure(go.Pie(
+                    values=category_counts.values.tolist(),
+                    labels=category_counts.index.tolist(),
+                    marker_colors=qualitative.Set3
+                ))
+                pie_fig.update_layout(title="Entity Category Distribution", **DEFAULT_LAYOUT)
+                
+                type_counts = _type_counts(filtered_entities, selected_categories, selected_types)
+                bar_fig = go.Figure(go.Bar(
+                    x=type_counts.index.tolist(),
+                    y=type_counts.values.tolist(),
+                    marker_color='#3498DB'
+                ))
+                bar_fig.update_layout(
+                    title="Entity Type Distribution",
+                    xaxis_title="Entity Type",
+                    yaxis_title="Count",
+                    **DEFAULT_LAYOUT
+                )
+                
+                box_fig = _quantile_box(
+                    filtered_entities, 'category', 'confidence', "Entity Confidence by Category"
+                )
+                
+                # Stable keys let Streamlit update the charts in place across reruns
+                with st.container(border=True):
                     col1, col2 = st.columns(2)
-                    
                     with col1:
-                        fig = px.pie(
-                            filtered_entities,
-                            names='category',
-                            title="Entity Category Distribution",
-                            color_discrete_sequence=px.colors.qualitative.Set3
-                        )
-                        fig.update_layout(
-                            margin=dict(t=40, b=20, l=20, r=20)
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-                    
+                        st.plotly_chart(pie_fig, use_container_width=True, key="entity_category_pie")
                     with col2:
-                        type_counts = filtered_entities['type'].value_counts()
-                        fig = px.bar(
-                            type_counts,
-                            title="Entity Type Distribution",
-                            labels={'value': 'Count', 'index': 'Entity Type'},
-                            color_discrete_sequence=['#3498DB']
-                        )
-                        fig.update_layout(
-                            plot_bgcolor='white',
-                            paper_bgcolor='white',
-                            margin=dict(t=40, b=20, l=20, r=20)
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
+                        st.plotly_chart(bar_fig, use_container_width=True, key="entity_type_bar")
                     
                     # Confidence Analysis
-                    if 'confidence' in filtered_entities.columns:
-                        st.markdown("#### Confidence Analysis")
-                        fig = px.box(
-                            filtered_entities,
-                            x='category',
-                            y='confidence',
-                            title="Entity Confidence by Category",
-                            color_discrete_sequence=['#3498DB']
-                        )
-                        fig.update_layout(
-                            plot_bgcolor='white',
-                            paper_bgcolor='white',
-                            margin=dict(t=40, b=20, l=20, r=20)
-                        )
-                        st.plotly_chart(fig, use_container_width=True)
-                else:
-                    st.info("No entities found in the processed data")
-            except Exception as e:
-                st.error(f"Error processing entities: {str(e)}")
-        else:
-            st.info("No entity data available. Process some medical text first.")
+                    st.markdown("#### Confidence Analysis")
+                    st.plotly_chart(box_fig, use_container_width=True, key="entity_confidence_box")
+            else:
+                st.info("No entities found in the processed data")
+        except Exception as e:
+            st.error(f"Error processing entities: {str(e)}")
+    else:
+        st.info("No entity data available. Process some medical text first.")
+
+_DATA_VIEW_TABS = {
+    "Patients": _patients_tab,
+    "Medical Records": _medical_records_tab,
+    "Entity Analysis": _entity_analysis_tab,
+}
+
+# Entity types surfaced in the formatted raw output
+_WANTED_TYPES = frozenset({'patient', 'gender', 'age', 'condition', 'medication', 'dosage', 'frequency'})
 
 def format_response_json(response_data):
     """Format the response data into a clean JSON string"""
     if isinstance(response_data, dict):
+        # Add entities: one flat pass with set membership (later occurrences win)
+        entities = response_data.get('entities', {})
         formatted_json = {
             "intent": response_data.get('intent', {}).get('primary_intent'),
-            "entities": {}
+            "entities": {
+                item['type']: item['text']
+                for item in chain.from_iterable(entities.values())
+                if item['type'] in _WANTED_TYPES
+            }
         }
         
-        # Add entities
-        entities = response_data.get('entities', {})
-        for category, items in entities.items():
-            for item in items:
-                if item['type'] in ['patient', 'gender', 'age', 'condition', 'medication', 'dosage', 'frequency']:
-                    formatted_json["entities"][item['type']] = item['text']
-        
         # Add medication validation if present
         if 'medication_validation' in response_data:
             formatted_json["medication_validation"] = response_data['medication_validation']
@@ -947,7 +1008,7 @@ def format_response_json(response_data):
         if 'follow_up_question' in response_data:
             formatted_json["follow_up_question"] = response_data['follow_up_question']
         
-        return json.dumps(formatted_json, indent=2)
+        return orjson.dumps(formatted_json, option=orjson.OPT_INDENT_2).decode()
     return str(response_data)
 
 def get_nurse_icon():
@@ -968,80 +1029,116 @@ def get_bot_icon():
     </div>
     """
 
-def show_chat_interface():
-    """Display chat interface page with enhanced chat history"""
-    st.title("Medical Task Management ChatBot 🏥")
-    
-    # Display chat history
-    for message in st.session_state.chat_history:
+# Chat bubble templates, filled straight from the message dict with str.format_map
+_USER_TMPL = (
+    '<div class="chat-container user-container">'
+    '<div class="chat-icon">👩‍⚕️</div>'
+    '<div class="message-container">'
+    '<div class="user-message">{message}</div>'
+    '<div class="timestamp user-timestamp">{timestamp}</div>'
+    '</div></div>'
+)
+_BOT_TMPL = (
+    '<div class="chat-container">'
+    '<div class="chat-icon">🤖</div>'
+    '<div class="message-container">'
+    '<div class="assistant-message">{message}</div>'
+    '<div class="timestamp assistant-timestamp">{timestamp}</div>'
+    '</div></div>'
+)
+_FOLLOWUP_TMPL = (
+    '<div class="chat-container">'
+    '<div class="chat-icon">🤖</div>'
+    '<div class="message-container">'
+    '<div class="follow-up-message">{message}</div>'
+    '<div class="timestamp assistant-timestamp">{timestamp}</div>'
+    '</div></div>'
+)
+
+def _render_result_panel(message: Dict[str, Any], live: bool = True):
+    """Render the charts and simplified entities of one response"""
+    message_id = message['id']
+    result = message['result']
+    # Older responses keep their charts behind a toggle
+    if live or st.toggle("Show charts", key=f"show_charts_{message_id}"):
+        # Build the figures once per message
+        if '_figures' not in message:
+            message['_figures'] = (
+                build_intent_gauge(result["intent"]),
+                visualize_entities(result["entities"])
+            )
+        intent_fig, entity_fig = message['_figures']
+        col1, col2 = st.columns(2)
+        with col1:
+            st.plotly_chart(intent_fig, use_container_width=True, key=f"intent_gauge_{message_id}")
+        with col2:
+            st.plotly_chart(
+                entity_fig,
+                use_container_width=True,
+                key=f"entity_chart_{message_id}",
+                config={"displayModeBar": False, "doubleClick": False}
+            )
+    display_extracted_info(result)
+
+def render_messages(messages: List[Dict[str, Any]], live_ids: frozenset = frozenset()):
+    """Render chat messages with their result panels; only results in live_ids chart by default"""
+    # Batch consecutive bubbles into one markdown call
+    html_parts = []
+    for message in messages:
         # Generate or get message ID
         message_id = message.get('id', str(uuid.uuid4()))
         if 'id' not in message:
             message['id'] = message_id
             
-        if message['is_user']:
-            st.markdown(
-                f"""
-                <div class="chat-container user-container">
-                    <div class="chat-icon">👩‍⚕️</div>
-                    <div class="message-container">
-                        <div class="user-message">{message['message']}</div>
-                        <div class="timestamp user-timestamp">{message['timestamp']}</div>
-                    </div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
-        else:
-            if message.get('is_follow_up'):
-                st.markdown(
-                    f"""
-                    <div class="chat-container">
-                        <div class="chat-icon">🤖</div>
-                        <div class="message-container">
-                            <div class="follow-up-message">{message['message']}</div>
-                            <div class="timestamp assistant-timestamp">{message['timestamp']}</div>
-                        </div>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
+        # Messages never change once appended, so their bubble HTML is built only once
+        if '_html' not in message:
+            if message['is_user']:
+                template = _USER_TMPL
+            elif message.get('is_follow_up'):
+                template = _FOLLOWUP_TMPL
             else:
-                st.markdown(
-                    f"""
-                    <div class="chat-container">
-                        <div class="chat-icon">🤖</div>
-                        <div class="message-container">
-                            <div class="assistant-message">{message['message']}</div>
-                            <div class="timestamp assistant-timestamp">{message['timestamp']}</div>
-                        </div>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
+                template = _BOT_TMPL
+            message['_html'] = template.format_map(message)
+        html_parts.append(message['_html'])
+        
+        # Display visualization for assistant responses if result exists
+        if not message['is_user'] and message.get('result'):
+            # Flush pending bubbles so the charts render below their message
+            st.markdown("\n".join(html_parts), unsafe_allow_html=True)
+            html_parts = []
             
-            # Display visualization for assistant responses if result exists
-            if message.get('result'):
-                result = message['result']
-                col1, col2 = st.columns(2)
-                with col1:
-                    display_intent_confidence(result["intent"], message_id)
-                with col2:
-                    fig = visualize_entities(result["entities"])
-                    st.plotly_chart(fig, key=f"entity_chart_{message_id}")
-                display_extracted_info(result)
+            _render_result_panel(message, live=message_id in live_ids)
+    
+    if html_parts:
+        st.markdown("\n".join(html_parts), unsafe_allow_html=True)
+
+@st.fragment
+def show_chat_interface():
+    """Display chat interface page with enhanced chat history"""
+    st.title("Medical Task Management ChatBot 🏥")
+    
+    # Only the latest messages are rendered by default
+    history = list(st.session_state.chat_history)
+    older, recent = history[:-MAX_RENDER], history[-MAX_RENDER:]
+    results = [m['id'] for m in history if not m['is_user'] and m.get('result')]
+    live_ids = frozenset(results[-MAX_LIVE_CHARTS:])
+    if older and st.checkbox(f"Show older messages ({len(older)})", key="show_older_messages"):
+        render_messages(older, live_ids)
+    render_messages(recent, live_ids)
     
     # Chat input
     if prompt := st.chat_input("Type your medical command here..."):
         # Generate unique ID for new message
         new_message_id = str(uuid.uuid4())
+        # All messages produced by this command share one timestamp
+        now = time.strftime("%H:%M:%S")
         
         # Add user message to chat history
         st.session_state.chat_history.append({
             'id': new_message_id,
             'message': prompt,
             'is_user': True,
-            'timestamp': datetime.now().strftime("%H:%M:%S")
+            'timestamp': now
         })
         
         # Process the command
@@ -1053,8 +1150,7 @@ def show_chat_interface():
             
             # Check for medication validation first
             if result["intent"]["primary_intent"] == "assign_medication":
-                med_entities = result["entities"].get("medical_info", [])
-                medication = next((e["text"] for e in med_entities if e["type"] == "medication"), None)
+                medication = result["_first"].get(("medical_info", "medication"))
                 
                 if "medication_validation" in result:
                     validation = result["medication_validation"]
@@ -1065,7 +1161,7 @@ def show_chat_interface():
                         'id': validation_msg_id,
                         'message': validation["message"],
                         'is_user': False,
-                        'timestamp': datetime.now().strftime("%H:%M:%S"),
+                        'timestamp': now,
                         'is_follow_up': False
                     })
                     
@@ -1076,7 +1172,7 @@ def show_chat_interface():
                             'id': follow_up_id,
                             'message': validation["follow_up_question"],
                             'is_user': False,
-                            'timestamp': datetime.now().strftime("%H:%M:%S"),
+                            'timestamp': now,
                             'is_follow_up': True
                         })
                         st.rerun()
@@ -1089,7 +1185,7 @@ def show_chat_interface():
                             'id': follow_up_id,
                             'message': validation["follow_up_question"],
                             'is_user': False,
-                            'timestamp': datetime.now().strftime("%H:%M:%S"),
+                            'timestamp': now,
                             'is_follow_up': True
                         })
                         st.rerun()
@@ -1103,7 +1199,7 @@ def show_chat_interface():
                     'id': follow_up_id,
                     'message': follow_up,
                     'is_user': False,
-                    'timestamp': datetime.now().strftime("%H:%M:%S"),
+                    'timestamp': now,
                     'is_follow_up': True
                 })
                 st.rerun()
@@ -1115,7 +1211,7 @@ def show_chat_interface():
                 'id': response_id,
                 'message': "Analysis completed. See results below.",
                 'is_user': False,
-                'timestamp': datetime.now().strftime("%H:%M:%S"),
+                'timestamp': now,
                 'result': result
             })
             
@@ -1125,78 +1221,32 @@ def show_chat_interface():
                 'id': error_id,
                 'message': f"Error: {response.get('error', 'Unknown error')}",
                 'is_user': False,
-                'timestamp': datetime.now().strftime("%H:%M:%S")
+                'timestamp': now
             })
         
         st.rerun()
 
-def handle_response(response: Dict[str, Any]):
-    """Handle API response and generate appropriate UI elements"""
-    if response["success"]:
-        result = response["result"]
-        
-        # Handle medication validation
-        if result["intent"]["primary_intent"] == "assign_medication":
-            if "medication_validation" in result:
-                validation = result["medication_validation"]
-                
-                # Add validation message to chat
-                st.session_state.chat_history.append({
-                    'message': validation["message"],
-                    'is_user': False,
-                    'timestamp': datetime.now().strftime("%H:%M:%S"),
-                    'is_follow_up': False
-                })
-                
-                # If validation failed or needs more info
-                if not validation["is_valid"] or validation["validation_step"] != "complete":
-                    st.session_state.chat_history.append({
-                        'message': validation["follow_up_question"],
-                        'is_user': False,
-                        'timestamp': datetime.now().strftime("%H:%M:%S"),
-                        'is_follow_up': True
-                    })
-                    
-                    # Add follow-up input
-                    with st.form(key='follow_up_form'):
-                        follow_up_response = st.text_input("Your response:")
-                        if st.form_submit_button("Submit"):
-                            # Process follow-up response
-                            st.session_state.chat_history.append({
-                                'message': follow_up_response,
-                                'is_user': True,
-                                'timestamp': datetime.now().strftime("%H:%M:%S")
-                            })
-                            # Process the follow-up response
-                            new_response = process_command(follow_up_response)
-                            if new_response["success"]:
-                                # Handle the new response recursively
-                                handle_response(new_response)
-                            st.rerun()
-                    return
 def clear_chat_history():
     """Clear the chat history"""
-    st.session_state.chat_history = []
+    st.session_state.chat_history = deque(maxlen=MAX_HISTORY)
     
 
 def main():
-    # Sidebar navigation
-    st.sidebar.title("Navigation")
-    page = st.sidebar.radio("Go to", ["Chat Interface", "Dashboard", "Data Views"])
+    # Sidebar navigation; only the selected page's function runs
+    page = st.navigation([
+        st.Page(show_chat_interface, title="Chat Interface", default=True),
+        st.Page(show_dashboard, title="Dashboard", url_path="dashboard"),
+        st.Page(show_data_views, title="Data Views", url_path="data-views"),
+    ])
     
-    # Settings
+    # Settings; widgets are keyed so their values live in session state across reruns
     st.sidebar.header("Settings")
-    st.session_state.show_raw_output = st.sidebar.checkbox("Show Raw API Output", value=False)
+    st.sidebar.checkbox("Show Raw API Output", value=False, key="show_raw_output")
     if st.sidebar.button("Clear Chat History"):
         clear_chat_history()
     
     # Display selected page
-    if page == "Chat Interface":
-        show_chat_interface()
-    elif page == "Dashboard":
-        show_dashboard()
-    elif page == "Data Views":
-        show_data_views()
+    page.run()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,12 +1,15 @@
 from fastapi import logger
 import streamlit as st # type: ignore
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 import plotly.graph_objects as go # type: ignore
 import plotly.express as px # type: ignore
-from datetime import datetime
+import time
 from typing import Dict, Any, List, Optional
 import pandas as pd
+from itertools import chain
 
 # Configure page
 st.set_page_config(
@@ -186,22 +189,35 @@ if "appointments" not in st.session_state:
 if "pipeline_type" not in st.session_state:
     st.session_state.pipeline_type = "transformer"
 
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Shared HTTP session whose keep-alive connection pool survives script reruns"""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(total=2, backoff_factor=0.1)  # POST is retried on connect errors only
+    ))
+    return session
+
 def process_command(text: str) -> Dict[str, Any]:
     """Send command to API and get response"""
     api_url = "http://localhost:8000/api/process"
     
     try:
-        response = requests.post(
+        # Pre-encode the body with orjson rather than requests' stdlib json
+        response = get_session().post(
             api_url,
-            json={
+            data=orjson.dumps({
                 "text": text,
                 "conversation_history": st.session_state.conversation_history,
                 "pipeline_type": st.session_state.pipeline_type
-            },
-            timeout=30  # Add timeout
+            }),
+            headers={"Content-Type": "application/json"},
+            timeout=(2, 30)  # (connect, read)
         )
         response.raise_for_status()
-        result = response.json()
+        result = orjson.loads(response.content)
         
         if not result.get("success"):
             error_msg = result.get("error", "Unknown error occurred")
@@ -238,18 +254,15 @@ def update_session_data(result: Dict[str, Any]):
         patient_data = {
             'name': next((e['text'] for e in entities['patient_info'] if e['type'] == 'patient'), None),
             'age': next((e['text'] for e in entities['patient_info'] if e['type'] == 'age'), None),
-            'gender': next((e['text'] for e in entities['patient_info'] if e['type'] == 'gender'), None),  # Updated gender extraction
+            # Prefer patient_info, then fall back to the other categories in order
+            'gender': (
+                next((e['text'] for e in entities['patient_info'] if e['type'] == 'gender'), None)
+                or next((e['text'] for category, items in entities.items() if category != 'patient_info'
+                         for e in items if e['type'] == 'gender'), None)
+            ),
             'condition': next((e['text'] for e in entities.get('medical_info', []) if e['type'] == 'condition'), None)
         }
         
-        # If gender not found in patient_info, try other entity categories
-        if not patient_data['gender']:
-            for category in entities.values():
-                gender_entity = next((e['text'] for e in category if e['type'] == 'gender'), None)
-                if gender_entity:
-                    patient_data['gender'] = gender_entity
-                    break
-        
         if patient_data['name']:
             # Create DataFrame if it doesn't exist
             if 'patients' not in st.session_state:
@@ -403,7 +416,7 @@ def display_extracted_info(result: Dict[str, Any]):
         "entities": entities
     }
     
-    st.code(json.dumps(simplified, indent=2), language="json")
+    st.code(orjson.dumps(simplified, option=orjson.OPT_INDENT_2).decode(), language="json")
 
 def show_dashboard():
     """Display enhanced dashboard page"""
@@ -492,7 +505,7 @@ def show_dashboard():
     if st.session_state.processed_texts:
         recent_df = pd.DataFrame([
             {
-                'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'Timestamp': time.strftime("%Y-%m-%d %H:%M:%S"),
                 'Intent': text['intent']['primary_intent'],
                 'Confidence': f"{text['intent']['confidence']:.2%}",
                 'Entities': len([item for category in text['entities'].values() for item in category])
@@ -690,7 +703,7 @@ def show_data_views():
                             'type': item['type'],
                             'value': item['text'],
                             'confidence': item.get('confidence', 'N/A'),
-                            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                            'timestamp': time.strftime("%Y-%m-%d %H:%M:%S")
                         })
                 
                 if medical_records:
@@ -769,7 +782,7 @@ def show_data_views():
                                 'type': entity['type'],
                                 'value': entity['text'],
                                 'confidence': entity.get('confidence', 'N/A'),
-                                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                                'timestamp': time.strftime("%Y-%m-%d %H:%M:%S")
                             })
                 
                 if all_entities:
@@ -861,21 +874,23 @@ def show_data_views():
         else:
             st.info("No entity data available. Process some medical text first.")
 
+# Entity types surfaced in the formatted raw output
+_WANTED_TYPES = frozenset({'patient', 'gender', 'age', 'condition', 'medication', 'dosage', 'frequency'})
+
 def format_response_json(response_data):
     """Format the response data into a clean JSON string"""
     if isinstance(response_data, dict):
+        # Add entities: one flat pass with set membership (later occurrences win)
+        entities = response_data.get('entities', {})
         formatted_json = {
             "intent": response_data.get('intent', {}).get('primary_intent'),
-            "entities": {}
+            "entities": {
+                item['type']: item['text']
+                for item in chain.from_iterable(entities.values())
+                if item['type'] in _WANTED_TYPES
+            }
         }
         
-        # Add entities
-        entities = response_data.get('entities', {})
-        for category, items in entities.items():
-            for item in items:
-                if item['type'] in ['patient', 'gender', 'age', 'condition', 'medication', 'dosage', 'frequency']:
-                    formatted_json["entities"][item['type']] = item['text']
-        
         # Add medication validation if present
         if 'medication_validation' in response_data:
             formatted_json["medication_validation"] = response_data['medication_validation']
@@ -884,7 +899,7 @@ def format_response_json(response_data):
         if 'follow_up_question' in response_data:
             formatted_json["follow_up_question"] = response_data['follow_up_question']
         
-        return json.dumps(formatted_json, indent=2)
+        return orjson.dumps(formatted_json, option=orjson.OPT_INDENT_2).decode()
     return str(response_data)
 
 def get_nurse_icon():
@@ -967,7 +982,10 @@ def show_chat_interface():
             
             # Display JSON response if available and requested
             if message.get('result') and st.session_state.show_raw_output:
-                st.code(format_response_json(message['result']), language='json')
+                # Messages never change once appended, so serialize each result only once
+                if '_formatted_json' not in message:
+                    message['_formatted_json'] = format_response_json(message['result'])
+                st.code(message['_formatted_json'], language='json')
             
             # Display visualization for assistant responses if result exists
             if message.get('result') and not message.get('is_error'):
@@ -993,7 +1011,7 @@ def show_chat_interface():
         st.session_state.chat_history.append({
             'message': prompt,
             'is_user': True,
-            'timestamp': datetime.now().strftime("%H:%M:%S")
+            'timestamp': time.strftime("%H:%M:%S")
         })
         
         # Process the command
@@ -1005,7 +1023,7 @@ def show_chat_interface():
                     st.session_state.chat_history.append({
                         'message': f"Error: {response.get('error', 'Unknown error')}",
                         'is_user': False,
-                        'timestamp': datetime.now().strftime("%H:%M:%S"),
+                        'timestamp': time.strftime("%H:%M:%S"),
                         'is_error': True
                     })
                     st.rerun()
@@ -1019,7 +1037,7 @@ def show_chat_interface():
                         st.session_state.chat_history.append({
                             'message': result["llm_response"],
                             'is_user': False,
-                            'timestamp': datetime.now().strftime("%H:%M:%S"),
+                            'timestamp': time.strftime("%H:%M:%S"),
                             'result': result
                         })
                         st.rerun()
@@ -1037,7 +1055,7 @@ def show_chat_interface():
                         st.session_state.chat_history.append({
                             'message': validation["message"],
                             'is_user': False,
-                            'timestamp': datetime.now().strftime("%H:%M:%S"),
+                            'timestamp': time.strftime("%H:%M:%S"),
                             'is_follow_up': False
                         })
                         
@@ -1046,7 +1064,7 @@ def show_chat_interface():
                             st.session_state.chat_history.append({
                                 'message': validation["follow_up_question"],
                                 'is_user': False,
-                                'timestamp': datetime.now().strftime("%H:%M:%S"),
+                                'timestamp': time.strftime("%H:%M:%S"),
                                 'is_follow_up': True
                             })
                             st.rerun()
@@ -1057,7 +1075,7 @@ def show_chat_interface():
                             st.session_state.chat_history.append({
                                 'message': validation["follow_up_question"],
                                 'is_user': False,
-                                'timestamp': datetime.now().strftime("%H:%M:%S"),
+                                'timestamp': time.strftime("%H:%M:%S"),
                                 'is_follow_up': True
                             })
                             st.rerun()
@@ -1069,7 +1087,7 @@ def show_chat_interface():
                     st.session_state.chat_history.append({
                         'message': follow_up,
                         'is_user': False,
-                        'timestamp': datetime.now().strftime("%H:%M:%S"),
+                        'timestamp': time.strftime("%H:%M:%S"),
                         'is_follow_up': True
                     })
                     st.rerun()
@@ -1079,7 +1097,7 @@ def show_chat_interface():
                 st.session_state.chat_history.append({
                     'message': "Analysis completed. See results below.",
                     'is_user': False,
-                    'timestamp': datetime.now().strftime("%H:%M:%S"),
+                    'timestamp': time.strftime("%H:%M:%S"),
                     'result': result
                 })
                 
@@ -1087,7 +1105,7 @@ def show_chat_interface():
                 st.session_state.chat_history.append({
                     'message': f"Error processing command: {str(e)}",
                     'is_user': False,
-                    'timestamp': datetime.now().strftime("%H:%M:%S"),
+                    'timestamp': time.strftime("%H:%M:%S"),
                     'is_error': True
                 })
             
@@ -1107,7 +1125,7 @@ def handle_response(response: Dict[str, Any]):
                 st.session_state.chat_history.append({
                     'message': validation["message"],
                     'is_user': False,
-                    'timestamp': datetime.now().strftime("%H:%M:%S"),
+                    'timestamp': time.strftime("%H:%M:%S"),
                     'is_follow_up': False
                 })
                 
@@ -1116,7 +1134,7 @@ def handle_response(response: Dict[str, Any]):
                     st.session_state.chat_history.append({
                         'message': validation["follow_up_question"],
                         'is_user': False,
-                        'timestamp': datetime.now().strftime("%H:%M:%S"),
+                        'timestamp': time.strftime("%H:%M:%S"),
                         'is_follow_up': True
                     })
                     
@@ -1128,7 +1146,7 @@ def handle_response(response: Dict[str, Any]):
                             st.session_state.chat_history.append({
                                 'message': follow_up_response,
                                 'is_user': True,
-                                'timestamp': datetime.now().strftime("%H:%M:%S")
+                                'timestamp': time.strftime("%H:%M:%S")
                             })
                             # Process the follow-up response
                             new_response = process_command(follow_up_response)